@@ -0,0 +1,112 @@
+"""PDF serialization for the Quadra Markdown converter.
+
+This module has no dependencies beyond the standard library and is fully
+annotated so that it can optionally be compiled with mypyc for faster output
+of large documents. A compiled extension placed next to this file is picked up
+automatically in place of the pure Python source.
+"""
+
+from __future__ import annotations
+
+from array import array
+from pathlib import Path
+from typing import ClassVar, Dict, List, Sequence, Tuple
+
+# Draw commands for a single page, stored column-wise as parallel sequences of
+# font sizes, x positions, y positions and text.
+Page = Tuple["array[float]", "array[float]", "array[float]", List[str]]
+
+
+class PDFWriter:
+    """Serialize pages built by ``PDFBuilder`` into a PDF file."""
+
+    _ESCAPE_TABLE: ClassVar[Dict[int, str]] = {ord("\\"): "\\\\", ord("("): "\\(", ord(")"): "\\)"}
+    _LINE_TEMPLATE: ClassVar[str] = "BT\n/F1 %.2f Tf\n1 0 0 1 %.2f %.2f Tm\n(%s) Tj\nET\n"
+
+    def __init__(self, width: float, height: float, pages: Sequence[Page]):
+        self.width = width
+        self.height = height
+        self.pages = pages
+
+    @classmethod
+    def _escape_text(cls, text: str) -> str:
+        # Input is already WinAnsi (cp1252) safe (see ``quadra_to_pdf._to_winansi``);
+        # only PDF string delimiters need escaping.
+        return text.translate(cls._ESCAPE_TABLE)
+
+    def _page_stream(self, page: Page) -> bytes:
+        template = self._LINE_TEMPLATE
+        escape = self._escape_text
+        return "".join(
+            template % (font_size, x_pos, y_pos, escape(text)) for font_size, x_pos, y_pos, text in zip(*page)
+        ).encode("cp1252")
+
+    def write(self, output_path: Path) -> None:
+        num_pages = len(self.pages)
+        page_object_start = 3
+        content_object_start = page_object_start + num_pages
+        font_object_id = content_object_start + num_pages
+        total_objects = font_object_id
+
+        chunks: List[bytes] = []
+        offset = 0
+
+        def write(data: str | bytes) -> None:
+            nonlocal offset
+            if isinstance(data, str):
+                data = data.encode("latin-1")
+            chunks.append(data)
+            offset += len(data)
+
+        xref_positions: List[int] = []
+
+        def start_obj(obj_id: int) -> None:
+            xref_positions.append(offset)
+            write(f"{obj_id} 0 obj\n")
+
+        write("%PDF-1.4\n")
+
+        # 1 0 obj: Catalog
+        start_obj(1)
+        write("<< /Type /Catalog /Pages 2 0 R >>\nendobj\n")
+
+        # 2 0 obj: Pages container
+        start_obj(2)
+        kids = " ".join(f"{obj_id} 0 R" for obj_id in range(page_object_start, page_object_start + num_pages))
+        write(f"<< /Type /Pages /Kids [ {kids} ] /Count {num_pages} >>\nendobj\n")
+
+        # Page objects
+        for index in range(num_pages):
+            page_obj_id = page_object_start + index
+            content_obj_id = content_object_start + index
+            start_obj(page_obj_id)
+            write(
+                "<< /Type /Page /Parent 2 0 R "
+                f"/MediaBox [0 0 {self.width:.0f} {self.height:.0f}] "
+                f"/Resources << /Font << /F1 {font_object_id} 0 R >> >> "
+                f"/Contents {content_obj_id} 0 R >>\nendobj\n"
+            )
+
+        # Content streams
+        for index, page in enumerate(self.pages):
+            stream = self._page_stream(page)
+            content_obj_id = content_object_start + index
+            start_obj(content_obj_id)
+            write(f"<< /Length {len(stream)} >>\nstream\n")
+            write(stream)
+            write("endstream\nendobj\n")
+
+        # Font object (Helvetica)
+        start_obj(font_object_id)
+        write("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>\nendobj\n")
+
+        xref_start = offset
+        xref_entries = "".join(f"{pos:010} 00000 n \n" for pos in xref_positions)
+        write(f"xref\n0 {total_objects + 1}\n0000000000 65535 f \n{xref_entries}")
+        write(
+            "trailer "
+            f"<< /Size {total_objects + 1} /Root 1 0 R >>\n"
+            f"startxref\n{xref_start}\n%%EOF\n"
+        )
+
+        output_path.write_bytes(b"".join(chunks))
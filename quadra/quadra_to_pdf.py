@@ -15,87 +15,213 @@ content is readable and paginated when the text exceeds the current page.
 from __future__ import annotations
 
 import argparse
-import io
-import textwrap
+import functools
+import re
 import unicodedata
-from dataclasses import dataclass
+from array import array
 from pathlib import Path
-from typing import Iterable, List, Sequence, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# Only one of these imports resolves, depending on whether the file is checked
+# or imported as part of the ``quadra`` package or as a standalone script, so
+# each ignores the error of the other case.
+try:
+    from .pdf_writer import Page, PDFWriter  # type: ignore[import-not-found, unused-ignore]
+except ImportError:  # Run as a script, with quadra/ as the first sys.path entry.
+    from pdf_writer import Page, PDFWriter  # type: ignore[import-not-found, no-redef, unused-ignore]
+
+# Block type tags. A parsed block is a ``(tag, content)`` tuple where content is
+# ``(level, text)`` for headings, the joined text for paragraphs and the list of
+# item strings for lists.
+HEADING, PARAGRAPH, LIST = 0, 1, 2
+Block = Tuple[int, object]
+
+# Characters that WinAnsiEncoding (cp1252) can represent, excluding the C1
+# control characters whose byte values WinAnsi reuses for other glyphs.
+_WINANSI_CHARS = bytes(range(256)).decode("cp1252", "ignore")
+
+# Runs of characters that Helvetica cannot draw with WinAnsiEncoding.
+_NON_WINANSI = re.compile(f"[^{re.escape(_WINANSI_CHARS)}]+")
+
+# Helvetica glyph advance widths in 1/1000 em for each WinAnsiEncoding byte,
+# taken from the Adobe Core 14 AFM metrics. Control characters are zero-width
+# and unassigned codes use the width of the bullet Acrobat substitutes.
+_HELVETICA_WIDTHS = (
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584, 350,
+    556, 350, 222, 556, 333, 1000, 556, 556, 333, 1000, 667, 333, 1000, 350, 611, 350,
+    350, 222, 222, 333, 333, 350, 556, 1000, 333, 1000, 500, 333, 944, 350, 500, 667,
+    278, 333, 556, 556, 556, 556, 260, 556, 333, 737, 370, 556, 584, 333, 737, 333,
+    400, 584, 333, 333, 333, 556, 537, 278, 333, 333, 365, 556, 834, 834, 834, 611,
+    667, 667, 667, 667, 667, 667, 1000, 722, 667, 667, 667, 667, 278, 278, 278, 278,
+    722, 722, 778, 778, 778, 778, 778, 584, 778, 722, 722, 722, 722, 667, 667, 611,
+    556, 556, 556, 556, 556, 556, 889, 500, 556, 556, 556, 556, 278, 278, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 584, 611, 556, 556, 556, 556, 500, 556, 500,
+)
+
+# The same widths keyed by the character each byte decodes to, so measuring text
+# never has to go through the cp1252 codec. Unassigned bytes are left out.
+_CHAR_WIDTHS: Dict[str, int] = {
+    char: width
+    for char, width in zip(bytes(range(256)).decode("cp1252", "replace"), _HELVETICA_WIDTHS)
+    if char != "\ufffd"
+}
+
+
+def parse_quadra_markdown(text: str) -> Iterator[Block]:
+    """Parse Quadra Markdown text, yielding structured blocks as they complete."""
 
-
-@dataclass
-class Block:
-    """Represents a parsed Quadra Markdown block."""
-
-    type: str
-    content: object
-
-
-def parse_quadra_markdown(text: str) -> List[Block]:
-    """Parse Quadra Markdown text into structured blocks."""
-
-    blocks: List[Block] = []
     paragraph: List[str] = []
     current_list: List[str] | None = None
 
-    def flush_paragraph() -> None:
-        nonlocal paragraph
-        if paragraph:
-            joined = " ".join(line.strip() for line in paragraph if line.strip())
-            if joined:
-                blocks.append(Block("paragraph", joined))
-        paragraph = []
-
-    def flush_list() -> None:
-        nonlocal current_list
-        if current_list:
-            blocks.append(Block("list", current_list))
-        current_list = None
-
     for raw_line in text.splitlines():
-        line = raw_line.rstrip()
-        stripped = line.strip()
+        stripped = raw_line.strip()
 
         if not stripped:
-            flush_paragraph()
-            flush_list()
+            if paragraph:
+                yield PARAGRAPH, " ".join(paragraph)
+                paragraph = []
+            if current_list:
+                yield LIST, current_list
+            current_list = None
             continue
 
-        if stripped.startswith("#"):
-            flush_paragraph()
-            flush_list()
+        first = stripped[0]
+        if first == "#":
+            if paragraph:
+                yield PARAGRAPH, " ".join(paragraph)
+                paragraph = []
+            if current_list:
+                yield LIST, current_list
+            current_list = None
             level = len(stripped) - len(stripped.lstrip("#"))
-            heading_text = stripped[level:].strip()
-            blocks.append(Block("heading", (level, heading_text)))
-            continue
-
-        if stripped.startswith("- "):
-            flush_paragraph()
+            yield HEADING, (level, stripped[level:].strip())
+        elif first == "-" and stripped[:2] == "- ":
+            if paragraph:
+                yield PARAGRAPH, " ".join(paragraph)
+                paragraph = []
             if current_list is None:
                 current_list = []
             current_list.append(stripped[2:].strip())
-            continue
-
-        flush_list()
-        paragraph.append(stripped)
-
-    flush_paragraph()
-    flush_list()
-    return blocks
+        else:
+            if current_list:
+                yield LIST, current_list
+            current_list = None
+            paragraph.append(stripped)
+
+    if paragraph:
+        yield PARAGRAPH, " ".join(paragraph)
+    if current_list:
+        yield LIST, current_list
+
+
+# Widths of words already measured by ``_wrap``. Documents reuse a small
+# vocabulary, so this saves most of the measuring work; it is emptied once it
+# holds ``_WORD_WIDTHS_LIMIT`` entries to keep memory bounded.
+_WORD_WIDTHS: Dict[str, int] = {}
+_WORD_WIDTHS_LIMIT = 1 << 16
+
+
+def _text_width(text: str) -> int:
+    """Return the Helvetica width of ``text`` in 1/1000 em units."""
+
+    return sum(map(_CHAR_WIDTHS.__getitem__, text))
+
+
+def _wrap(text: str, max_width: float, font_size: float) -> List[str]:
+    """Greedily pack whitespace-separated words into lines at most ``max_width`` points wide.
+
+    Widths are measured with the Helvetica metrics at ``font_size``, so ``text``
+    must already be normalized with ``_to_winansi``. Words wider than a full
+    line are split across lines.
+    """
+
+    limit = max_width * 1000.0 / font_size
+    char_width_of = _CHAR_WIDTHS.__getitem__
+    word_widths = _WORD_WIDTHS
+    if len(word_widths) >= _WORD_WIDTHS_LIMIT:
+        word_widths.clear()
+    space_width = _CHAR_WIDTHS[" "]
+    lines: List[str] = []
+    current = ""
+    current_width = 0
+    for word in text.split():
+        word_width = word_widths.get(word)
+        if word_width is None:
+            word_width = word_widths[word] = sum(map(char_width_of, word))
+        if word_width > limit:
+            if current:
+                lines.append(current)
+                current = ""
+            piece, piece_width = "", 0
+            for char in word:
+                char_width = char_width_of(char)
+                if piece and piece_width + char_width > limit:
+                    lines.append(piece)
+                    piece, piece_width = "", 0
+                piece += char
+                piece_width += char_width
+            word, word_width = piece, piece_width
+        if not current:
+            current, current_width = word, word_width
+        elif current_width + space_width + word_width <= limit:
+            current += " " + word
+            current_width += space_width + word_width
+        else:
+            lines.append(current)
+            current, current_width = word, word_width
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _strip_to_winansi(match: re.Match[str]) -> str:
+    decomposed = unicodedata.normalize("NFKD", match.group())
+    return decomposed.encode("cp1252", "ignore").decode("cp1252")
+
+
+def _to_winansi(text: str) -> str:
+    """Normalize text to characters that the Helvetica base font can draw.
+
+    Text is composed with NFC and every character WinAnsiEncoding (cp1252) can
+    represent is kept as-is. Runs of remaining characters are decomposed with
+    NFKD and reduced to their WinAnsi base letters or compatibility
+    equivalents, dropping those without one.
+    """
+
+    if text.isascii():
+        return text
+    return _NON_WINANSI.sub(_strip_to_winansi, unicodedata.normalize("NFC", text))
 
 
 class PDFBuilder:
     """Create PDF content for parsed blocks using basic typography."""
 
+    # Font sizes indexed by heading level; index 0 is the fallback for other levels.
+    _HEADING_SIZES = (14.0, 24.0, 18.0, 16.0)
+
     def __init__(self, width: float = 612.0, height: float = 792.0, margin: float = 72.0):
         self.width = width
         self.height = height
         self.margin = margin
-        self.pages: List[List[Tuple[float, float, float, str]]] = []
+        self.pages: List[Page] = []
+        # Shares one string object between identical drawn lines (repeated
+        # headings, bullets, blank lines) across all pages.
+        self._interned: Dict[str, str] = {}
         self._new_page()
 
     def _new_page(self) -> None:
-        self.current_page: List[Tuple[float, float, float, str]] = []
+        self._font_sizes = array("d")
+        self._x_positions = array("d")
+        self._y_positions = array("d")
+        self._texts: List[str] = []
+        self.current_page: Page = (self._font_sizes, self._x_positions, self._y_positions, self._texts)
         self.pages.append(self.current_page)
         self.cursor_y = self.height - self.margin
 
@@ -103,55 +229,70 @@ class PDFBuilder:
         if self.cursor_y - line_height < self.margin:
             self._new_page()
 
-    def _add_line(self, text: str, font_size: float, indent: float = 0.0) -> None:
+    def _add_lines(self, lines: Sequence[str], font_size: float, indent: float = 0.0) -> None:
+        """Draw consecutive lines, filling the current page before starting a new one.
+
+        Lines must already be normalized with ``_to_winansi``.
+        """
+
         line_height = font_size * 1.2
-        self._ensure_space(line_height)
         x_position = self.margin + indent
-        normalized = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
-        self.current_page.append((font_size, x_position, self.cursor_y, normalized))
-        self.cursor_y -= line_height
+        interned = self._interned
+        texts = [interned.setdefault(line, line) for line in lines]
+
+        start = 0
+        while start < len(texts):
+            self._ensure_space(line_height)
+            # The small tolerance keeps a line that ends exactly on the bottom
+            # margin from being pushed to the next page by rounding error.
+            fitting = max(int((self.cursor_y - self.margin) / line_height + 1e-9), 1)
+            chunk = texts[start : start + fitting]
+            count = len(chunk)
+            top = self.cursor_y
+            self._font_sizes.extend([font_size] * count)
+            self._x_positions.extend([x_position] * count)
+            self._y_positions.extend([top - index * line_height for index in range(count)])
+            self._texts.extend(chunk)
+            self.cursor_y = top - count * line_height
+            start += count
+
+    def _add_line(self, text: str, font_size: float, indent: float = 0.0) -> None:
+        self._add_lines((text,), font_size, indent)
 
     def add_heading(self, level: int, text: str) -> None:
-        size_map = {1: 24.0, 2: 18.0, 3: 16.0}
-        font_size = size_map.get(level, 14.0)
-        self.cursor_y -= font_size * 0.3
-        self._add_line(text, font_size)
-        self.cursor_y -= font_size * 0.3
+        font_size = self._HEADING_SIZES[level if 0 < level <= 3 else 0]
+        padding = font_size * 0.3
+        self.cursor_y -= padding
+        self._add_line(_to_winansi(text), font_size)
+        self.cursor_y -= padding
 
     def add_paragraph(self, text: str, indent: float = 0.0, font_size: float = 12.0) -> None:
         max_width = self.width - 2 * self.margin - indent
-        chars_per_line = max(int(max_width / (font_size * 0.55)), 20)
-        wrapped = textwrap.wrap(text, width=chars_per_line)
-        if not wrapped:
-            wrapped = [""]
-        for idx, line in enumerate(wrapped):
-            prefix = "" if idx else ""
-            self._add_line(prefix + line, font_size, indent)
+        wrapped = _wrap(_to_winansi(text), max_width, font_size) or [""]
+        self._add_lines(wrapped, font_size, indent)
         self.cursor_y -= font_size * 0.4
 
     def add_list(self, items: Sequence[str]) -> None:
+        bullet_prefix = "- "
+        # Leave room for the bullet, which is at least as wide as the
+        # two-space continuation indent.
+        max_width = self.width - 2 * self.margin - 18.0 - _text_width(bullet_prefix) * 12.0 / 1000.0
         for item in items:
-            bullet_prefix = "- "
-            max_width = self.width - 2 * self.margin - 18.0
-            chars_per_line = max(int(max_width / (12.0 * 0.55)), 20)
-            wrapped = textwrap.wrap(item, width=chars_per_line)
-            for idx, line in enumerate(wrapped):
-                if idx == 0:
-                    text_line = f"{bullet_prefix}{line}"
-                else:
-                    text_line = f"  {line}"
-                self._add_line(text_line, 12.0, indent=18.0)
+            wrapped = _wrap(_to_winansi(item), max_width, 12.0)
+            if wrapped:
+                wrapped[0] = f"{bullet_prefix}{wrapped[0]}"
+                wrapped[1:] = [f"  {line}" for line in wrapped[1:]]
+            self._add_lines(wrapped, 12.0, indent=18.0)
             self.cursor_y -= 12.0 * 0.4
 
+    def _add_heading_block(self, content: Tuple[int, str]) -> None:
+        self.add_heading(*content)
+
     def build(self, blocks: Iterable[Block]) -> None:
-        for block in blocks:
-            if block.type == "heading":
-                level, text = block.content  # type: ignore[misc]
-                self.add_heading(level, text)
-            elif block.type == "paragraph":
-                self.add_paragraph(block.content)  # type: ignore[arg-type]
-            elif block.type == "list":
-                self.add_list(block.content)  # type: ignore[arg-type]
+        # Indexed by block type tag: HEADING, PARAGRAPH, LIST.
+        handlers: Tuple[Callable[[Any], None], ...] = (self._add_heading_block, self.add_paragraph, self.add_list)
+        for block_type, content in blocks:
+            handlers[block_type](content)
 
     def write_pdf(self, output_path: Path) -> None:
         output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -159,107 +300,23 @@ class PDFBuilder:
         writer.write(output_path)
 
 
-class PDFWriter:
-    """Serialize pages built by :class:`PDFBuilder` into a PDF file."""
+def convert_quadra_markdown(input_path: Path, output_path: Path, force: bool = False) -> bool:
+    """Convert ``input_path`` to a PDF at ``output_path``.
 
-    def __init__(self, width: float, height: float, pages: Sequence[Sequence[Tuple[float, float, float, str]]]):
-        self.width = width
-        self.height = height
-        self.pages = pages
-
-    @staticmethod
-    def _escape_text(text: str) -> str:
-        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
-
-    def _page_stream(self, page: Sequence[Tuple[float, float, float, str]]) -> bytes:
-        commands = []
-        for font_size, x_pos, y_pos, text in page:
-            commands.append("BT")
-            commands.append(f"/F1 {font_size:.2f} Tf")
-            commands.append(f"1 0 0 1 {x_pos:.2f} {y_pos:.2f} Tm")
-            commands.append(f"({self._escape_text(text)}) Tj")
-            commands.append("ET")
-        commands.append("")
-        return "\n".join(commands).encode("latin-1")
-
-    def write(self, output_path: Path) -> None:
-        num_pages = len(self.pages)
-        page_object_start = 3
-        content_object_start = page_object_start + num_pages
-        font_object_id = content_object_start + num_pages
-        total_objects = font_object_id
-
-        buffer = io.BytesIO()
-
-        def write(data: str | bytes) -> None:
-            if isinstance(data, str):
-                data = data.encode("latin-1")
-            buffer.write(data)
-
-        xref_positions: List[int] = []
-
-        def start_obj(obj_id: int) -> None:
-            xref_positions.append(buffer.tell())
-            write(f"{obj_id} 0 obj\n")
-
-        write("%PDF-1.4\n")
-
-        # 1 0 obj: Catalog
-        start_obj(1)
-        write("<< /Type /Catalog /Pages 2 0 R >>\nendobj\n")
-
-        # 2 0 obj: Pages container
-        start_obj(2)
-        kids = " ".join(f"{obj_id} 0 R" for obj_id in range(page_object_start, page_object_start + num_pages))
-        write(f"<< /Type /Pages /Kids [ {kids} ] /Count {num_pages} >>\nendobj\n")
-
-        # Page objects
-        for index in range(num_pages):
-            page_obj_id = page_object_start + index
-            content_obj_id = content_object_start + index
-            start_obj(page_obj_id)
-            write(
-                "<< /Type /Page /Parent 2 0 R "
-                f"/MediaBox [0 0 {self.width:.0f} {self.height:.0f}] "
-                f"/Resources << /Font << /F1 {font_object_id} 0 R >> >> "
-                f"/Contents {content_obj_id} 0 R >>\nendobj\n"
-            )
-
-        # Content streams
-        for index, page in enumerate(self.pages):
-            stream = self._page_stream(page)
-            content_obj_id = content_object_start + index
-            start_obj(content_obj_id)
-            write(f"<< /Length {len(stream)} >>\nstream\n")
-            buffer.write(stream)
-            write("endstream\nendobj\n")
-
-        # Font object (Helvetica)
-        start_obj(font_object_id)
-        write("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>\nendobj\n")
-
-        xref_start = buffer.tell()
-        write(f"xref\n0 {total_objects + 1}\n")
-        write("0000000000 65535 f \n")
-        for pos in xref_positions:
-            write(f"{pos:010} 00000 n \n")
-        write(
-            "trailer "
-            f"<< /Size {total_objects + 1} /Root 1 0 R >>\n"
-            f"startxref\n{xref_start}\n%%EOF\n"
-        )
-
-        output_path.write_bytes(buffer.getvalue())
-
-
-def convert_quadra_markdown(input_path: Path, output_path: Path) -> None:
-    blocks = parse_quadra_markdown(input_path.read_text(encoding="utf-8"))
+    The conversion is skipped when the output is already newer than the input,
+    unless ``force`` is set. Returns whether a PDF was written.
+    """
+
+    if not force and output_path.exists() and output_path.stat().st_mtime >= input_path.stat().st_mtime:
+        return False
     builder = PDFBuilder()
-    builder.build(blocks)
+    builder.build(parse_quadra_markdown(input_path.read_bytes().decode("utf-8")))
     builder.write_pdf(output_path)
+    return True
 
 
-def main(argv: Sequence[str] | None = None) -> None:
+@functools.cache
+def _get_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Convert Quadra Markdown to PDF.")
     parser.add_argument("input", type=Path, help="Path to the Quadra Markdown file.")
     parser.add_argument(
@@ -268,15 +325,26 @@ def main(argv: Sequence[str] | None = None) -> None:
         nargs="?",
         help="Optional output path for the generated PDF (defaults to <input>.pdf).",
     )
-    args = parser.parse_args(argv)
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerate the PDF even if it is newer than the input file.",
+    )
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    args = _get_parser().parse_args(argv)
 
     input_path = args.input
     if not input_path.exists():
         raise SystemExit(f"Input file '{input_path}' does not exist.")
 
     output_path = args.output or input_path.with_suffix(".pdf")
-    convert_quadra_markdown(input_path, output_path)
-    print(f"Generated PDF: {output_path}")
+    if convert_quadra_markdown(input_path, output_path, force=args.force):
+        print(f"Generated PDF: {output_path}")
+    else:
+        print(f"PDF is up to date: {output_path}")
 
 
 if __name__ == "__main__":